@@ -128,14 +128,19 @@ class SECS:
         # by giving them zero weight
         W[S < epsilon*S.max()] = 0.
 
-        VWU = np.dot(Vh.T, np.dot(np.diag(W), U.T))
+        # Scale the columns of V by the weights rather than building the
+        # dense diagonal matrix, shape: nsec x nsv
+        VW = Vh.T * W
 
         # Store the fit 'sec_amps' in the object
+        # The SVD factors are applied one at a time to all of the timesteps
+        # at once, instead of forming the (nsec x nobs*3) pseudo-inverse
         # shape: ntimes x nsec
-        self.sec_amps = np.dot(VWU, (obs_B/obs_var).reshape(ntimes, -1).T).T
+        B_flat = (obs_B/obs_var).reshape(ntimes, -1)
+        self.sec_amps = np.dot(np.dot(B_flat, U), VW.T)
         # Maybe want the variance of the predictions sometime later...?
         # shape: nsec
-        self.sec_amps_var = np.sum((Vh.T * W)**2, axis=1)
+        self.sec_amps_var = np.sum(VW**2, axis=1)
 
         return self
 
@@ -145,7 +150,7 @@ class SECS:
 
         return self
 
-    def predict(self, pred_loc, J=False):
+    def predict(self, pred_loc, J=False, out=None):
         """Calculate the predicted magnetic field or currents.
 
         After a set of observations has been fit to this system we can
@@ -161,6 +166,10 @@ class SECS:
             Whether to predict currents (J=True) or magnetic fields (J=False)
             Default: False (magnetic field prediction)
 
+        out: ndarray (ntimes x npred x 3), optional
+            A C-contiguous float64 array to store the predictions in, which
+            avoids allocating a new output array on every call.
+
         Returns
         -------
         ndarray (ntimes x npred x 3 [lat, lon, r])
@@ -174,6 +183,15 @@ class SECS:
             raise ValueError("There are currently no currents associated with the SECs," +
                              "you need to call .fit() first to fit to some observations.")
 
+        ntimes = len(self.sec_amps)
+        out_shape = (ntimes, len(pred_loc), 3)
+        if out is None:
+            out = np.empty(out_shape)
+        elif (out.shape != out_shape or out.dtype != np.float64 or
+              not out.flags['C_CONTIGUOUS']):
+            raise ValueError("out must be a C-contiguous float64 array of shape {0}".format(
+                out_shape))
+
         # T_pred shape=(npred x 3 x nsec)
         # sec_amps shape=(nsec x ntimes)
         if J:
@@ -184,14 +202,16 @@ class SECS:
             T_pred = self._calc_T(pred_loc)
 
         # NOTE: dot product is slow on multi-dimensional arrays (i.e. > 2 dimensions)
-        #       Therefore this is implemented as tensordot, and the arguments are
-        #       arranged to eliminate needs of transposing things later.
-        #       The dot product is done over the SEC locations, so the final output
-        #       is of shape: (ntimes x npred x 3)
+        #       Therefore the transfer matrix is flattened to 2 dimensions
+        #       (npred*3 x nsec), which is a view, and the dot product is done
+        #       over the SEC locations directly into a flattened view of the
+        #       output, so the final output is of shape: (ntimes x npred x 3)
+        np.dot(self.sec_amps, T_pred.reshape(-1, self.nsec).T,
+               out=out.reshape(ntimes, -1))
 
-        return np.squeeze(np.tensordot(self.sec_amps, T_pred, (1, 2)))
+        return np.squeeze(out)
 
-    def predict_B(self, pred_loc):
+    def predict_B(self, pred_loc, out=None):
         """Calculate the predicted magnetic fields.
 
         After a set of observations has been fit to this system we can
@@ -203,15 +223,19 @@ class SECS:
         pred_loc: ndarray (npred x 3 [lat, lon, r])
             An array containing the locations where the predictions are desired.
 
+        out: ndarray (ntimes x npred x 3), optional
+            A C-contiguous float64 array to store the predictions in, which
+            avoids allocating a new output array on every call.
+
         Returns
         -------
         ndarray (ntimes x npred x 3 [lat, lon, r])
             The predicted values calculated from the current amplitudes that were
             fit to this system.
         """
-        return self.predict(pred_loc)
+        return self.predict(pred_loc, out=out)
 
-    def predict_J(self, pred_loc):
+    def predict_J(self, pred_loc, out=None):
         """Calculate the predicted currents.
 
         After a set of observations has been fit to this system we can
@@ -223,13 +247,17 @@ class SECS:
         pred_loc: ndarray (npred x 3 [lat, lon, r])
             An array containing the locations where the predictions are desired.
 
+        out: ndarray (ntimes x npred x 3), optional
+            A C-contiguous float64 array to store the predictions in, which
+            avoids allocating a new output array on every call.
+
         Returns
         -------
         ndarray (ntimes x npred x 3 [lat, lon, r])
             The predicted values calculated from the current amplitudes that were
             fit to this system.
         """
-        return self.predict(pred_loc, J=True)
+        return self.predict(pred_loc, J=True, out=out)
 
     def _calc_T(self, obs_loc):
         """Calculates the T transfer matrix.
@@ -258,6 +286,12 @@ class SECS:
         locations. It assumes unit current amplitudes that will then be
         scaled with the proper amplitudes later.
         """
+        if (self.has_df and self.has_cf and
+                np.array_equal(self.sec_df_loc, self.sec_cf_loc)):
+            # Co-located df and cf SECs can share the geometry calculations
+            J, J1 = _calc_transfers(obs_loc, self.sec_df_loc, which=("J_df", "J_cf"))
+            return np.concatenate([J, J1], axis=2)
+
         if self.has_df:
             J = J_df(obs_loc=obs_loc, sec_loc=self.sec_df_loc)
 
@@ -291,14 +325,160 @@ def T_df(obs_loc, sec_loc):
     ndarray (nobs, 3, nsec)
         The T transfer matrix.
     """
-    nobs = len(obs_loc)
-    nsec = len(sec_loc)
+    return _T_df(*_calc_geometry(obs_loc, sec_loc))
+
+
+def T_cf(obs_loc, sec_loc):
+    """Calculates the curl free magnetic field transfer function.
+
+    The transfer function goes from SEC location to observation location
+    and assumes unit current SECs at the given locations.
+
+    Parameters
+    ----------
+    obs_loc : ndarray (nobs, 3 [lat, lon, r])
+        The locations of the observation points.
+
+    sec_loc : ndarray (nsec, 3 [lat, lon, r])
+        The locations of the SEC points.
+
+    Returns
+    -------
+    ndarray (nobs, 3, nsec)
+        The T transfer matrix.
+    """
+    raise NotImplementedError("Curl Free Magnetic Field Transfers are not implemented yet.")
+
+
+def J_df(obs_loc, sec_loc):
+    """Calculates the divergence free current density transfer function.
+
+    The transfer function goes from SEC location to observation location
+    and assumes unit current SECs at the given locations.
+
+    Parameters
+    ----------
+    obs_loc : ndarray (nobs, 3 [lat, lon, r])
+        The locations of the observation points.
+
+    sec_loc : ndarray (nsec, 3 [lat, lon, r])
+        The locations of the SEC points.
+
+    Returns
+    -------
+    ndarray (nobs, 3, nsec)
+        The J transfer matrix.
+    """
+    J, = _calc_transfers(obs_loc, sec_loc, which=("J_df",))
+    return J
+
+
+def J_cf(obs_loc, sec_loc):
+    """Calculates the curl free magnetic field transfer function.
+
+    The transfer function goes from SEC location to observation location
+    and assumes unit current SECs at the given locations.
+
+    Parameters
+    ----------
+    obs_loc : ndarray (nobs, 3 [lat, lon, r])
+        The locations of the observation points.
+
+    sec_loc : ndarray (nsec, 3 [lat, lon, r])
+        The locations of the SEC points.
+
+    Returns
+    -------
+    ndarray (nobs, 3, nsec)
+        The J transfer matrix.
+    """
+    J, = _calc_transfers(obs_loc, sec_loc, which=("J_cf",))
+    return J
+
+
+def _calc_transfers(obs_loc, sec_loc, which=("T_df", "J_df", "J_cf")):
+    """Calculates several transfer functions for the same locations at once.
+
+    The geometry between the observation and SEC locations (angular
+    distance and bearing) is only calculated once and shared between
+    all of the requested transfer functions.
+
+    Parameters
+    ----------
+    obs_loc : ndarray (nobs, 3 [lat, lon, r])
+        The locations of the observation points.
+
+    sec_loc : ndarray (nsec, 3 [lat, lon, r])
+        The locations of the SEC points.
 
-    obs_r = obs_loc[:, 2][:, np.newaxis]
-    sec_r = sec_loc[:, 2][np.newaxis, :]
+    which : sequence of str
+        Names of the transfer functions to calculate, any of
+        "T_df", "J_df" and "J_cf".
+        Default: all of them
 
-    theta = calc_angular_distance(obs_loc[:, :2], sec_loc[:, :2])
-    alpha = calc_bearing(obs_loc[:, :2], sec_loc[:, :2])
+    Returns
+    -------
+    tuple of ndarray (nobs, 3, nsec)
+        The transfer matrices, in the same order as `which`.
+    """
+    funcs = {"T_df": _T_df, "J_df": _J_df, "J_cf": _J_cf}
+    for name in which:
+        if name not in funcs:
+            raise ValueError("Unknown transfer function: {0}".format(name))
+
+    obs_loc = np.asarray(obs_loc, dtype=float)
+    sec_loc = np.asarray(sec_loc, dtype=float)
+
+    # The currents are only non-zero on the SEC shells, so when only currents
+    # are requested the observations off of every shell can skip the
+    # geometry calculations entirely and stay zero
+    on_shell = np.isin(obs_loc[:, 2], sec_loc[:, 2])
+    if "T_df" in which or np.all(on_shell):
+        geometry = _calc_geometry(obs_loc, sec_loc)
+        return tuple(funcs[name](*geometry) for name in which)
+
+    transfers = tuple(np.zeros((len(obs_loc), 3, len(sec_loc))) for _ in which)
+    if np.any(on_shell):
+        geometry = _calc_geometry(obs_loc[on_shell], sec_loc)
+        for transfer, name in zip(transfers, which):
+            transfer[on_shell] = funcs[name](*geometry)
+    return transfers
+
+
+def _calc_geometry(obs_loc, sec_loc):
+    """Calculates the geometry shared by all of the transfer functions.
+
+    Returns the observation radii (nobs x 1), SEC radii (1 x nsec),
+    and the cosine, sine and half-angle tangent of the angular distance
+    and the sine and cosine of the bearing (nobs x nsec).
+    """
+    # Split the (lat, lon, r) rows into contiguous column arrays once,
+    # so the elementwise math below works on unit-stride data
+    # obs along the rows (nobs x 1), secs along the columns (1 x nsec)
+    obs_lat, obs_lon, obs_r = _split_latlonr(obs_loc, axis=1)
+    sec_lat, sec_lon, sec_r = _split_latlonr(sec_loc, axis=0)
+
+    # alpha == angle (from cartesian x-axis (By), going towards y-axis (Bx))
+    hav, sin_alpha, cos_alpha = _angular_distance_and_bearing(obs_lat, obs_lon,
+                                                              sec_lat, sec_lon)
+
+    # Trig of the angular distance (theta) from hav = sin(theta/2)**2,
+    # computed once for all of the transfer functions.
+    # hav == 0 exactly for co-located points, so sin_theta and tan_theta2
+    # are exactly 0 there. Antipodal points (hav == 1) give tan_theta2 == inf.
+    cos_theta = 1 - 2*hav
+    one_minus_hav = 1 - hav
+    sin_theta = 2*np.sqrt(hav*one_minus_hav)
+    with np.errstate(divide='ignore'):
+        tan_theta2 = np.sqrt(hav/one_minus_hav)
+
+    return obs_r, sec_r, cos_theta, sin_theta, tan_theta2, sin_alpha, cos_alpha
+
+
+def _T_df(obs_r, sec_r, cos_theta, sin_theta, tan_theta2, sin_alpha, cos_alpha):
+    """Divergence free magnetic field transfer function from the geometry."""
+    nobs = obs_r.shape[0]
+    nsec = sec_r.shape[1]
 
     # magnetic permeability
     mu0 = 4*np.pi*1e-7
@@ -306,8 +486,6 @@ def T_df(obs_loc, sec_loc):
     # simplify calculations by storing this ratio
     x = obs_r/sec_r
 
-    sin_theta = np.sin(theta)
-    cos_theta = np.cos(theta)
     factor = 1./np.sqrt(1 - 2*x*cos_theta + x**2)
 
     # Amm & Viljanen: Equation 9
@@ -348,135 +526,66 @@ def T_df(obs_loc, sec_loc):
         Br[under_locs] = Br2[under_locs]
 
     # Transform back to Bx, By, Bz at each local point
+    # (written directly into the output to avoid temporaries)
     T = np.empty((nobs, 3, nsec))
-    # alpha == angle (from cartesian x-axis (By), going towards y-axis (Bx))
-    T[:, 0, :] = -Btheta*np.sin(alpha)
-    T[:, 1, :] = -Btheta*np.cos(alpha)
-    T[:, 2, :] = -Br
+    np.negative(Btheta, out=Btheta)
+    np.multiply(Btheta, sin_alpha, out=T[:, 0, :])
+    np.multiply(Btheta, cos_alpha, out=T[:, 1, :])
+    np.negative(Br, out=T[:, 2, :])
 
     return T
 
 
-def T_cf(obs_loc, sec_loc):
-    """Calculates the curl free magnetic field transfer function.
-
-    The transfer function goes from SEC location to observation location
-    and assumes unit current SECs at the given locations.
-
-    Parameters
-    ----------
-    obs_loc : ndarray (nobs, 3 [lat, lon, r])
-        The locations of the observation points.
-
-    sec_loc : ndarray (nsec, 3 [lat, lon, r])
-        The locations of the SEC points.
-
-    Returns
-    -------
-    ndarray (nobs, 3, nsec)
-        The T transfer matrix.
-    """
-    raise NotImplementedError("Curl Free Magnetic Field Transfers are not implemented yet.")
-
-
-def J_df(obs_loc, sec_loc):
-    """Calculates the divergence free current density transfer function.
-
-    The transfer function goes from SEC location to observation location
-    and assumes unit current SECs at the given locations.
-
-    Parameters
-    ----------
-    obs_loc : ndarray (nobs, 3 [lat, lon, r])
-        The locations of the observation points.
-
-    sec_loc : ndarray (nsec, 3 [lat, lon, r])
-        The locations of the SEC points.
-
-    Returns
-    -------
-    ndarray (nobs, 3, nsec)
-        The J transfer matrix.
-    """
-    nobs = len(obs_loc)
-    nsec = len(sec_loc)
-
-    obs_r = obs_loc[:, 2][:, np.newaxis]
-    sec_r = sec_loc[:, 2][np.newaxis, :]
-
-    # Input to the distance calculations is degrees, output is in radians
-    theta = calc_angular_distance(obs_loc[:, :2], sec_loc[:, :2])
-    alpha = calc_bearing(obs_loc[:, :2], sec_loc[:, :2])
+def _J_df(obs_r, sec_r, cos_theta, sin_theta, tan_theta2, sin_alpha, cos_alpha):
+    """Divergence free current density transfer function from the geometry."""
+    nobs = obs_r.shape[0]
+    nsec = sec_r.shape[1]
 
     # Amm & Viljanen: Equation 6
-    tan_theta2 = np.tan(theta/2.)
 
     J_phi = 1./(4*np.pi*sec_r)
-    J_phi = np.divide(J_phi, tan_theta2, out=np.ones_like(tan_theta2)*np.inf,
+    J_phi = np.divide(J_phi, tan_theta2, out=np.full(tan_theta2.shape, np.inf),
                       where=tan_theta2 != 0.)
     # Only valid on the SEC shell
     J_phi[sec_r != obs_r] = 0.
 
     # Transform back to Bx, By, Bz at each local point
+    # (written directly into the output to avoid temporaries)
     J = np.empty((nobs, 3, nsec))
-    # alpha == angle (from cartesian x-axis (By), going towards y-axis (Bx))
-    J[:, 0, :] = -J_phi*np.cos(alpha)
-    J[:, 1, :] = J_phi*np.sin(alpha)
+    np.multiply(J_phi, sin_alpha, out=J[:, 1, :])
+    np.negative(J_phi, out=J_phi)
+    np.multiply(J_phi, cos_alpha, out=J[:, 0, :])
     J[:, 2, :] = 0.
 
     return J
 
 
-def J_cf(obs_loc, sec_loc):
-    """Calculates the curl free magnetic field transfer function.
-
-    The transfer function goes from SEC location to observation location
-    and assumes unit current SECs at the given locations.
-
-    Parameters
-    ----------
-    obs_loc : ndarray (nobs, 3 [lat, lon, r])
-        The locations of the observation points.
-
-    sec_loc : ndarray (nsec, 3 [lat, lon, r])
-        The locations of the SEC points.
-
-    Returns
-    -------
-    ndarray (nobs, 3, nsec)
-        The J transfer matrix.
-    """
-    nobs = len(obs_loc)
-    nsec = len(sec_loc)
-
-    obs_r = obs_loc[:, 2][:, np.newaxis]
-    sec_r = sec_loc[:, 2][np.newaxis, :]
-
-    theta = calc_angular_distance(obs_loc[:, :2], sec_loc[:, :2])
-    alpha = calc_bearing(obs_loc[:, :2], sec_loc[:, :2])
+def _J_cf(obs_r, sec_r, cos_theta, sin_theta, tan_theta2, sin_alpha, cos_alpha):
+    """Curl free current density transfer function from the geometry."""
+    nobs = obs_r.shape[0]
+    nsec = sec_r.shape[1]
 
     # Amm & Viljanen: Equation 7
-    tan_theta2 = np.tan(theta/2.)
 
     J_theta = 1./(4*np.pi*sec_r)
-    J_theta = np.divide(J_theta, tan_theta2, out=np.ones_like(tan_theta2)*np.inf,
-                        where=tan_theta2 != 0)
+    J_theta = np.divide(J_theta, tan_theta2, out=np.full(tan_theta2.shape, np.inf),
+                        where=tan_theta2 != 0.)
     # Uniformly directed FACs around the globe, except the pole
     # Integrated over the globe, this will lead to zero
     J_r = -np.ones(J_theta.shape)/(4*np.pi*sec_r**2)
-    J_r[theta == 0.] = 1.
+    J_r[tan_theta2 == 0.] = 1.
 
     # Only valid on the SEC shell
     J_theta[sec_r != obs_r] = 0.
     J_r[sec_r != obs_r] = 0.
 
     # Transform back to Bx, By, Bz at each local point
+    # (written directly into the output to avoid temporaries)
     J = np.empty((nobs, 3, nsec))
-    # alpha == angle (from cartesian x-axis (By), going towards y-axis (Bx))
-
-    J[:, 0, :] = -J_theta*np.sin(alpha)
-    J[:, 1, :] = -J_theta*np.cos(alpha)
-    J[:, 2, :] = -J_r
+    np.negative(J_theta, out=J_theta)
+    np.multiply(J_theta, sin_alpha, out=J[:, 0, :])
+    np.multiply(J_theta, cos_alpha, out=J[:, 1, :])
+    np.negative(J_r, out=J[:, 2, :])
 
     return J
 
@@ -505,12 +614,7 @@ def calc_angular_distance(latlon1, latlon2):
     lat2 = np.deg2rad(latlon2[:, 0])[np.newaxis, :]
     lon2 = np.deg2rad(latlon2[:, 1])[np.newaxis, :]
 
-    dlon = lon2 - lon1
-
-    # theta == angular distance between two points
-    theta = np.arccos(np.sin(lat1)*np.sin(lat2) +
-                      np.cos(lat1)*np.cos(lat2)*np.cos(dlon))
-    return theta
+    return _angular_distance(lat1, lon1, lat2, lon2)
 
 
 def calc_bearing(latlon1, latlon2):
@@ -539,8 +643,130 @@ def calc_bearing(latlon1, latlon2):
     lat2 = np.deg2rad(latlon2[:, 0])[np.newaxis, :]
     lon2 = np.deg2rad(latlon2[:, 1])[np.newaxis, :]
 
-    dlon = lon2 - lon1
+    return _bearing(lat1, lon1, lat2, lon2)
+
 
+def _split_latlonr(loc, axis):
+    """Split an (n x 3 [lat, lon, r]) array into contiguous columns.
+
+    The latitude and longitude are converted from degrees to radians,
+    and an empty dimension is inserted at `axis` of each column so the
+    results broadcast against another set of points.
+    """
+    loc = np.asarray(loc, dtype=float)
+    lat = np.expand_dims(np.deg2rad(loc[:, 0]), axis)
+    lon = np.expand_dims(np.deg2rad(loc[:, 1]), axis)
+    r = np.expand_dims(np.ascontiguousarray(loc[:, 2]), axis)
+    return lat, lon, r
+
+
+def _angular_distance(lat1, lon1, lat2, lon2):
+    """Angular distance (radians) between broadcastable points in radians."""
+    cos_lat1, cos_lat2 = np.cos(lat1), np.cos(lat2)
+    # Half-angle differences from the angle subtraction formula,
+    # sin(a - b) = sin(a)cos(b) - cos(a)sin(b), so the transcendentals are
+    # only evaluated on the (n x 1) and (1 x m) inputs
+    sin_dlat2 = _sin_diff(lat2/2., lat1/2.)
+    sin_dlon2 = _sin_diff(lon2/2., lon1/2.)
+    return _haversine(sin_dlat2, sin_dlon2, cos_lat1, cos_lat2)
+
+
+def _bearing(lat1, lon1, lat2, lon2):
+    """Bearing (radians) between broadcastable points in radians."""
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_lat2, cos_lat2 = np.sin(lat2), np.cos(lat2)
+    # sin/cos of the longitude difference from the angle subtraction formulas,
+    # only evaluating the transcendentals on the (n x 1) and (1 x m) inputs
+    sin_lon1, cos_lon1 = np.sin(lon1), np.cos(lon1)
+    sin_lon2, cos_lon2 = np.sin(lon2), np.cos(lon2)
+    sin_dlon = sin_lon2*cos_lon1 - cos_lon2*sin_lon1
+    cos_dlon = cos_lon2*cos_lon1 + sin_lon2*sin_lon1
+    return _bearing_angle(sin_dlon, cos_dlon, sin_lat1, cos_lat1, sin_lat2, cos_lat2)
+
+
+def _angular_distance_and_bearing(lat1, lon1, lat2, lon2):
+    """Angular distance and bearing between broadcastable points in radians.
+
+    Returns the haversine of the angular distance, sin(theta/2)**2, and the
+    sine and cosine of the bearing. Both quantities are built from the same
+    sine/cosine evaluations, which are only done once per point. Everything
+    on the broadcast (n x m) grid is then multiply/add, apart from the hypot.
+    Only use this when both quantities are needed, otherwise
+    `_angular_distance` or `_bearing` skip the unused work.
+    """
+    # Sines and cosines of each point, shape (n x 1) or (1 x m)
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_lat2, cos_lat2 = np.sin(lat2), np.cos(lat2)
+    sin_hlat1, cos_hlat1 = np.sin(lat1/2.), np.cos(lat1/2.)
+    sin_hlat2, cos_hlat2 = np.sin(lat2/2.), np.cos(lat2/2.)
+    sin_hlon1, cos_hlon1 = np.sin(lon1/2.), np.cos(lon1/2.)
+    sin_hlon2, cos_hlon2 = np.sin(lon2/2.), np.cos(lon2/2.)
+
+    # Half-angle differences from the angle subtraction formulas,
+    # sin(a - b) = sin(a)cos(b) - cos(a)sin(b), shape (n x m)
+    sin_dlat2 = sin_hlat2*cos_hlat1 - cos_hlat2*sin_hlat1
+    sin_dlon2 = sin_hlon2*cos_hlon1 - cos_hlon2*sin_hlon1
+    cos_dlon2 = cos_hlon2*cos_hlon1 + sin_hlon2*sin_hlon1
+    # Double angle formulas for the full longitude difference
+    sin_dlon = 2*sin_dlon2*cos_dlon2
+    cos_dlon = 1 - 2*sin_dlon2**2
+
+    # With alpha = pi/2 - arctan2(y, x), sin(alpha) = x/h and cos(alpha) = y/h,
+    # which avoids the arctan2 and the sin/cos of alpha on the grid
+    y, x = _bearing_components(sin_dlon, cos_dlon, sin_lat1, cos_lat1,
+                               sin_lat2, cos_lat2)
+    h = np.hypot(x, y)
+    # Co-located points have h == 0, use arctan2(0, 0) == 0 (alpha == pi/2)
+    sin_alpha = np.divide(x, h, out=np.ones_like(h), where=h != 0)
+    cos_alpha = np.divide(y, h, out=np.zeros_like(h), where=h != 0)
+
+    hav = _hav(sin_dlat2, sin_dlon2, cos_lat1, cos_lat2)
+    return hav, sin_alpha, cos_alpha
+
+
+def _haversine(sin_dlat2, sin_dlon2, cos_lat1, cos_lat2):
+    """Angular distance (radians) from the half-angle difference sines.
+
+    The (n x m) `sin_dlat2` and `sin_dlon2` arrays are overwritten.
+    """
+    hav = _hav(sin_dlat2, sin_dlon2, cos_lat1, cos_lat2)
+
+    # theta == angular distance between two points
+    np.sqrt(hav, out=hav)
+    np.arcsin(hav, out=hav)
+    hav *= 2.
+    return hav
+
+
+def _hav(sin_dlat2, sin_dlon2, cos_lat1, cos_lat2):
+    """Haversine of the angular distance, hav = sin(theta/2)**2.
+
+    The (n x m) `sin_dlat2` and `sin_dlon2` arrays are overwritten.
+    """
+    # Haversine formula, which avoids the arccos of the spherical law of
+    # cosines that loses all precision near zero distance.
+    # NOTE: The half-angle differences come from the subtraction formula,
+    #       so their absolute error is about 1e-16 rad and the relative
+    #       error grows as the points get closer (about 3e-7 at 1e-6 degrees).
+    # The (n x m) work array is reused in-place to avoid extra temporaries
+    hav = np.square(sin_dlon2, out=sin_dlon2)
+    hav *= cos_lat1
+    hav *= cos_lat2
+    hav += np.square(sin_dlat2, out=sin_dlat2)
+    # Round-off can push the argument slightly past 1 for antipodal points
+    np.clip(hav, 0., 1., out=hav)
+    return hav
+
+
+def _bearing_angle(sin_dlon, cos_dlon, sin_lat1, cos_lat1, sin_lat2, cos_lat2):
+    """Bearing (radians) from the sines and cosines of the points."""
+    y, x = _bearing_components(sin_dlon, cos_dlon, sin_lat1, cos_lat1,
+                               sin_lat2, cos_lat2)
+    return np.pi/2 - np.arctan2(y, x)
+
+
+def _bearing_components(sin_dlon, cos_dlon, sin_lat1, cos_lat1, sin_lat2, cos_lat2):
+    """The (y, x) arguments of the arctan2 giving the bearing."""
     # alpha == bearing, going from point1 to point2
     #          angle (from cartesian x-axis (By), going towards y-axis (Bx))
     # Used to rotate the SEC coordinate frame into the observation coordinate
@@ -548,7 +774,10 @@ def calc_bearing(latlon1, latlon2):
     # SEC coordinates are: theta (colatitude (+ away from North Pole)),
     #                      phi (longitude, + east), r (+ out)
     # Obs coordinates are: X (+ north), Y (+ east), Z (+ down)
-    alpha = np.pi/2 - np.arctan2(np.sin(dlon)*np.cos(lat2),
-                                 np.cos(lat1)*np.sin(lat2) -
-                                 np.sin(lat1)*np.cos(lat2)*np.cos(dlon))
-    return alpha
+    # alpha = pi/2 - arctan2(y, x)
+    return sin_dlon*cos_lat2, cos_lat1*sin_lat2 - sin_lat1*cos_lat2*cos_dlon
+
+
+def _sin_diff(a, b):
+    """sin(a - b) for broadcastable a and b via the angle subtraction formula."""
+    return np.sin(a)*np.cos(b) - np.cos(a)*np.sin(b)
@@ -4,6 +4,23 @@ import pytest
 import pysecs
 
 R_EARTH = 6378e3
+SEC_R = R_EARTH + 100
+
+
+def _readonly(arr):
+    "Mark a shared module-level array as read-only."
+    arr.setflags(write=False)
+    return arr
+
+
+# Single SEC on the equator at the prime meridian
+SEC_EQUATOR = _readonly(np.array([[0., 0., SEC_R]]))
+SEC_EQUATOR_GROUND = _readonly(np.array([[0., 0., R_EARTH]]))
+# Observations in a circle around the equatorial SEC
+OBS_CIRCLE_GROUND = _readonly(np.array([[5., 0., R_EARTH], [0., 5., R_EARTH],
+                                        [-5, 0., R_EARTH], [0., -5., R_EARTH]]))
+OBS_CIRCLE_SEC = _readonly(np.array([[5., 0., SEC_R], [0., 5., SEC_R],
+                                     [-5, 0., SEC_R], [0., -5., SEC_R]]))
 
 
 def test_angular_distance():
@@ -14,6 +31,14 @@ def test_angular_distance():
                        np.deg2rad([[0., 90., 90., 180.]]))
 
 
+def test_angular_distance_small():
+    "Test the angular distance formula for nearby points."
+    latlon1 = np.array([[45., 10.]])
+    latlon2 = np.array([[45. + 1e-7, 10.], [45., 10.]])
+    assert_allclose(pysecs.calc_angular_distance(latlon1, latlon2),
+                    np.deg2rad([[1e-7, 0.]]), rtol=1e-6)
+
+
 def test_bearing():
     "Test the cardinal directions."
     latlon1 = np.array([[0., 0.]])
@@ -25,11 +50,9 @@ def test_bearing():
 def test_divergence_free_magnetic_directions():
     "Make sure the divergence free magnetic field angles are correct"
     # Place the SEC at the equator
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_latlonr = SEC_EQUATOR
     # Going around in a circle from the point
-    obs_latlonr = np.array([[5., 0., R_EARTH], [0., 5., R_EARTH],
-                            [-5, 0., R_EARTH], [0., -5., R_EARTH]])
+    obs_latlonr = OBS_CIRCLE_GROUND
 
     B = np.squeeze(pysecs.T_df(obs_latlonr, sec_latlonr))
 
@@ -42,20 +65,20 @@ def test_divergence_free_magnetic_directions():
 def test_divergence_free_magnetic_magnitudes_obs_under():
     "Make sure the divergence free magnetic amplitudes are correct."
     # Place the SEC at the North Pole
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_r = SEC_R
+    sec_latlonr = SEC_EQUATOR
     # Going out in an angle from the SEC (in longitude)
-    angles = np.linspace(0.1, 180)
+    theta = np.linspace(np.deg2rad(0.1), np.pi)
     obs_r = R_EARTH
-    obs_latlonr = np.zeros(angles.shape + (3,))
-    obs_latlonr[:, 1] = angles
+    obs_latlonr = np.zeros(theta.shape + (3,))
+    obs_latlonr[:, 1] = np.rad2deg(theta)
     obs_latlonr[:, 2] = obs_r
 
     B = np.squeeze(pysecs.T_df(obs_latlonr, sec_latlonr))
 
-    # All x components should be zero (angles goes around the equator and all
+    # All x components should be zero (theta goes around the equator and all
     # quantities should be parallel to that)
-    assert_allclose(np.zeros(angles.shape), B[:, 0], atol=1e-16)
+    assert_allclose(np.zeros(theta.shape), B[:, 0], atol=1e-16)
 
     # Actual magnitude
     mu0 = 4*np.pi*1e-7
@@ -63,8 +86,8 @@ def test_divergence_free_magnetic_magnitudes_obs_under():
     # simplify calculations by storing this ratio
     x = obs_r/sec_r
 
-    sin_theta = np.sin(np.deg2rad(angles))
-    cos_theta = np.cos(np.deg2rad(angles))
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
     factor = 1./np.sqrt(1 - 2*x*cos_theta + x**2)
 
     # Amm & Viljanen: Equation 9
@@ -74,7 +97,10 @@ def test_divergence_free_magnetic_magnitudes_obs_under():
 
     # Amm & Viljanen: Equation 10
     Btheta = -mu0/(4*np.pi*obs_r) * (factor*(x - cos_theta) + cos_theta)
-    Btheta = np.divide(Btheta, sin_theta, out=np.zeros_like(sin_theta), where=sin_theta != 0)
+    # sin(theta) is only zero at the antipode (theta == pi), where the
+    # numerator is round-off and the field is zero by symmetry
+    Btheta /= sin_theta
+    Btheta[-1] = 0.
     assert_allclose(Btheta, B[:, 1])
 
 
@@ -82,26 +108,26 @@ def test_divergence_free_magnetic_magnitudes_obs_over():
     "Make sure the divergence free magnetic amplitudes are correct."
     # Place the SEC at the North Pole
     sec_r = R_EARTH
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_latlonr = SEC_EQUATOR_GROUND
     # Going out in an angle from the SEC (in longitude)
-    angles = np.linspace(0.1, 180)
+    theta = np.linspace(np.deg2rad(0.1), np.pi)
     obs_r = R_EARTH + 100
-    obs_latlonr = np.zeros(angles.shape + (3,))
-    obs_latlonr[:, 1] = angles
+    obs_latlonr = np.zeros(theta.shape + (3,))
+    obs_latlonr[:, 1] = np.rad2deg(theta)
     obs_latlonr[:, 2] = obs_r
 
     B = np.squeeze(pysecs.T_df(obs_latlonr, sec_latlonr))
 
-    # All x components should be zero (angles goes around the equator and all
+    # All x components should be zero (theta goes around the equator and all
     # quantities should be parallel to that)
-    assert_allclose(np.zeros(angles.shape), B[:, 0], atol=1e-16)
+    assert_allclose(np.zeros(theta.shape), B[:, 0], atol=1e-16)
 
     # Actual magnitude
     mu0 = 4*np.pi*1e-7
     x = sec_r/obs_r
 
-    sin_theta = np.sin(np.deg2rad(angles))
-    cos_theta = np.cos(np.deg2rad(angles))
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
 
     # Amm & Viljanen: Equation A.7
     Br = mu0*x/(4*np.pi*obs_r) * (1./np.sqrt(1 - 2*x*cos_theta + x**2) - 1)
@@ -111,14 +137,26 @@ def test_divergence_free_magnetic_magnitudes_obs_over():
     # Amm & Viljanen: Equation A.8
     Btheta = -mu0/(4*np.pi*obs_r)*((obs_r-sec_r*cos_theta) /
                                    np.sqrt(obs_r**2 - 2*obs_r*sec_r*cos_theta + sec_r**2) - 1)
-    Btheta = np.divide(Btheta, sin_theta, out=np.zeros_like(sin_theta), where=sin_theta != 0)
+    # sin(theta) is never zero on this sweep
+    Btheta /= sin_theta
     assert_allclose(Btheta, B[:, 1])
 
 
+def test_divergence_free_magnetic_colocated():
+    "Make sure the horizontal field is zero directly above/below the SEC."
+    sec_r = SEC_R
+    sec_latlonr = np.array([[10., 20., sec_r]])
+    obs_latlonr = np.array([[10., 20., R_EARTH], [10., 20., sec_r + 100.]])
+
+    B = np.squeeze(pysecs.T_df(obs_latlonr, sec_latlonr))
+    assert_array_equal(B[:, :2], 0.)
+    assert np.all(np.isfinite(B))
+
+
 def test_outside_current_plane():
     "Make sure all currents outside the SEC plane are 0."
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_r = SEC_R
+    sec_latlonr = SEC_EQUATOR
     # Above and below the plane, also on and off the SEC point
     obs_latlonr = np.array([[0., 0., sec_r - 100.], [0., 0., sec_r + 100.],
                             [5, 0., sec_r - 100.], [5., 0., sec_r + 100.]])
@@ -131,14 +169,27 @@ def test_outside_current_plane():
     assert np.all(J == 0.)
 
 
+def test_partially_outside_current_plane():
+    "Make sure only the observations on the SEC plane get currents."
+    sec_latlonr = np.array([[0., 0., SEC_R], [0., 5., SEC_R + 100.]])
+    obs_latlonr = np.concatenate([OBS_CIRCLE_GROUND, OBS_CIRCLE_SEC])
+    on_shell = obs_latlonr[:, 2] == SEC_R
+
+    geometry = pysecs.secs._calc_geometry(obs_latlonr, sec_latlonr)
+    for func, full_func in [(pysecs.J_df, pysecs.secs._J_df),
+                            (pysecs.J_cf, pysecs.secs._J_cf)]:
+        J = func(obs_latlonr, sec_latlonr)
+        assert J.shape == (len(obs_latlonr), 3, len(sec_latlonr))
+        assert np.all(J[~on_shell] == 0.)
+        assert_array_equal(J, full_func(*geometry))
+
+
 def test_divergence_free_current_directions():
     "Make sure the divergence free current angles are correct."
     # Place the SEC at the equator
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_latlonr = SEC_EQUATOR
     # Going around in a circle from the point
-    obs_latlonr = np.array([[5., 0., sec_r], [0., 5., sec_r],
-                            [-5, 0., sec_r], [0., -5., sec_r]])
+    obs_latlonr = OBS_CIRCLE_SEC
 
     J = np.squeeze(pysecs.J_df(obs_latlonr, sec_latlonr))
 
@@ -151,12 +202,12 @@ def test_divergence_free_current_directions():
 def test_divergence_free_current_magnitudes():
     "Make sure the divergence free current amplitudes are correct."
     # Place the SEC at the North Pole
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_r = SEC_R
+    sec_latlonr = SEC_EQUATOR
     # Going out in an angle from the SEC (in longitude)
-    angles = np.linspace(0.1, 180)
-    obs_latlonr = np.zeros(angles.shape + (3,))
-    obs_latlonr[:, 1] = angles
+    theta = np.linspace(np.deg2rad(0.1), np.pi)
+    obs_latlonr = np.zeros(theta.shape + (3,))
+    obs_latlonr[:, 1] = np.rad2deg(theta)
     obs_latlonr[:, 2] = sec_r
 
     J = np.squeeze(pysecs.J_df(obs_latlonr, sec_latlonr))
@@ -164,15 +215,15 @@ def test_divergence_free_current_magnitudes():
     # Make sure all radial components are zero in this system
     assert np.all(J[:, 2] == 0.)
 
-    # Also all y components (angles goes around the equator and all
+    # Also all y components (theta goes around the equator and all
     # quantities should be perpendicular to that)
-    assert_allclose(np.zeros(angles.shape), J[:, 1], atol=1e-16)
+    assert_allclose(np.zeros(theta.shape), J[:, 1], atol=1e-16)
 
     # Actual magnitude
-    tan_theta2 = np.tan(np.deg2rad(angles/2))
+    tan_theta2 = np.tan(theta/2)
     J_test = 1./(4*np.pi*sec_r)
-    J_test = np.divide(J_test, tan_theta2, out=np.ones_like(tan_theta2)*np.inf,
-                       where=tan_theta2 != 0.)
+    # tan(theta/2) is never zero on this sweep
+    J_test = J_test/tan_theta2
 
     assert_allclose(J_test, J[:, 0], atol=1e-16)
 
@@ -180,11 +231,9 @@ def test_divergence_free_current_magnitudes():
 def test_curl_free_current_directions():
     "Make sure the curl free current angles are correct."
     # Place the SEC at the equator
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_latlonr = SEC_EQUATOR
     # Going around in a circle from the point
-    obs_latlonr = np.array([[5., 0., sec_r], [0., 5., sec_r],
-                            [-5, 0., sec_r], [0., -5., sec_r]])
+    obs_latlonr = OBS_CIRCLE_SEC
 
     J = np.squeeze(pysecs.J_cf(obs_latlonr, sec_latlonr))
 
@@ -198,12 +247,12 @@ def test_curl_free_current_directions():
 def test_curl_free_current_magnitudes():
     "Make sure the curl free current amplitudes are correct."
     # Place the SEC at the North Pole
-    sec_r = R_EARTH + 100
-    sec_latlonr = np.array([[0., 0., sec_r]])
+    sec_r = SEC_R
+    sec_latlonr = SEC_EQUATOR
     # Going out in an angle from the SEC (in longitude)
-    angles = np.linspace(0.1, 180)
-    obs_latlonr = np.zeros(angles.shape + (3,))
-    obs_latlonr[:, 1] = angles
+    theta = np.linspace(np.deg2rad(0.1), np.pi)
+    obs_latlonr = np.zeros(theta.shape + (3,))
+    obs_latlonr[:, 1] = np.rad2deg(theta)
     obs_latlonr[:, 2] = sec_r
 
     J = np.squeeze(pysecs.J_cf(obs_latlonr, sec_latlonr))
@@ -212,20 +261,37 @@ def test_curl_free_current_magnitudes():
     radial_component = 1./(4*np.pi*sec_r**2)
     assert np.all(J[:, 2] == radial_component)
 
-    # All x components should be zero (angles goes around the equator and all
+    # All x components should be zero (theta goes around the equator and all
     # quantities should be parallel to that)
     # (ambiguous 0 degree angle so ignore the first input)
-    assert_allclose(np.zeros(angles.shape), J[:, 0], atol=1e-16)
+    assert_allclose(np.zeros(theta.shape), J[:, 0], atol=1e-16)
 
     # Actual magnitude
-    tan_theta2 = np.tan(np.deg2rad(angles/2))
+    tan_theta2 = np.tan(theta/2)
     J_test = 1./(4*np.pi*sec_r)
-    J_test = np.divide(J_test, tan_theta2, out=np.ones_like(tan_theta2)*np.inf,
-                       where=tan_theta2 != 0.)
+    # tan(theta/2) is never zero on this sweep
+    J_test = J_test/tan_theta2
 
     assert_allclose(J_test, J[:, 1], atol=1e-16)
 
 
+def test_calc_transfers():
+    "Make sure the shared geometry calculation matches the individual functions."
+    obs_latlonr = np.concatenate([OBS_CIRCLE_GROUND, OBS_CIRCLE_SEC])
+    sec_latlonr = np.array([[0., 0., SEC_R], [3., 4., SEC_R]])
+
+    T, J_df, J_cf = pysecs.secs._calc_transfers(obs_latlonr, sec_latlonr)
+    assert_array_equal(T, pysecs.T_df(obs_latlonr, sec_latlonr))
+    assert_array_equal(J_df, pysecs.J_df(obs_latlonr, sec_latlonr))
+    assert_array_equal(J_cf, pysecs.J_cf(obs_latlonr, sec_latlonr))
+
+    J_cf, = pysecs.secs._calc_transfers(obs_latlonr, sec_latlonr, which=("J_cf",))
+    assert_array_equal(J_cf, pysecs.J_cf(obs_latlonr, sec_latlonr))
+
+    with pytest.raises(ValueError):
+        pysecs.secs._calc_transfers(obs_latlonr, sec_latlonr, which=("T_cf",))
+
+
 def test_empty_object():
     "Testing empty secs object creation failure."
     with pytest.raises(ValueError):
@@ -242,3 +308,81 @@ def test_list_numpy():
     assert secs_list2.nsec == secs_np2.nsec
     assert_array_equal(secs_list2.sec_df_loc, secs_np2.sec_df_loc)
     assert_array_equal(secs_list2.sec_cf_loc, secs_np2.sec_cf_loc)
+
+
+def test_fit_multi_time():
+    "Make sure the fit recovers known amplitudes at multiple times."
+    sec_latlonr = np.array([[0., 0., SEC_R], [10., 10., SEC_R]])
+    secs = pysecs.SECS(sec_df_loc=sec_latlonr)
+    obs_latlonr = np.concatenate([OBS_CIRCLE_GROUND, SEC_EQUATOR_GROUND])
+
+    # shape: ntimes x nsec
+    amps = np.array([[1e5, -2e5], [3e5, 0.], [-1e5, 1e5]])
+    T = pysecs.T_df(obs_latlonr, sec_latlonr)
+    obs_B = np.einsum("ijk,tk->tij", T, amps)
+
+    secs.fit(obs_latlonr, obs_B, epsilon=0)
+    assert secs.sec_amps.shape == amps.shape
+    assert_allclose(secs.sec_amps, amps, atol=1e-6)
+    assert secs.sec_amps_var.shape == (2,)
+
+    # A single snapshot is expanded to one time
+    secs.fit(obs_latlonr, obs_B[0], epsilon=0)
+    assert_allclose(secs.sec_amps, amps[:1], atol=1e-6)
+
+
+def test_fit_obs_var():
+    "Make sure infinite variance removes observations from the fit."
+    sec_latlonr = np.array([[0., 0., SEC_R], [10., 10., SEC_R]])
+    secs = pysecs.SECS(sec_df_loc=sec_latlonr)
+    obs_latlonr = np.concatenate([OBS_CIRCLE_GROUND, SEC_EQUATOR_GROUND])
+
+    amps = np.array([[1e5, -2e5]])
+    T = pysecs.T_df(obs_latlonr, sec_latlonr)
+    obs_B = np.einsum("ijk,tk->tij", T, amps)
+    # Corrupt the last observation and ignore it with infinite variance
+    obs_B[:, -1, :] = 1.
+    obs_var = np.ones(obs_latlonr.shape)
+    obs_var[-1, :] = np.inf
+
+    secs.fit(obs_latlonr, obs_B, obs_var=obs_var, epsilon=0)
+    assert_allclose(secs.sec_amps, amps, atol=1e-6)
+
+
+def test_predictB():
+    "Make sure the predictions match the transfer functions and out buffer."
+    secs = pysecs.SECS(sec_df_loc=SEC_EQUATOR)
+    obs_B = np.ones((2, 1, 3))
+    obs_B[1] *= 2
+    secs.fit(SEC_EQUATOR_GROUND, obs_B)
+
+    pred_latlonr = OBS_CIRCLE_GROUND
+    T = pysecs.T_df(pred_latlonr, SEC_EQUATOR)[..., 0]
+    expected = secs.sec_amps[:, 0, np.newaxis, np.newaxis] * T
+    B_pred = secs.predict_B(pred_latlonr)
+    assert_allclose(B_pred, expected)
+
+    out = np.empty((2, len(pred_latlonr), 3))
+    B_pred = secs.predict_B(pred_latlonr, out=out)
+    assert np.shares_memory(B_pred, out)
+    assert_allclose(out, expected)
+
+    with pytest.raises(ValueError):
+        secs.predict_B(pred_latlonr, out=np.empty((2, 3, len(pred_latlonr))))
+    with pytest.raises(ValueError):
+        secs.predict_B(pred_latlonr, out=np.empty((2, len(pred_latlonr), 6))[..., ::2])
+    with pytest.raises(ValueError):
+        secs.predict_B(pred_latlonr, out=np.empty((2, len(pred_latlonr), 3), dtype=np.float32))
+    with pytest.raises(ValueError):
+        secs.predict_B(pred_latlonr, out=np.empty((2, len(pred_latlonr), 3), dtype=int))
+
+
+def test_predictJ():
+    "Make sure the current predictions match the transfer functions."
+    secs = pysecs.SECS(sec_df_loc=SEC_EQUATOR, sec_cf_loc=SEC_EQUATOR)
+    secs.fit_unit_currents()
+
+    J_pred = secs.predict_J(OBS_CIRCLE_SEC)
+    expected = (pysecs.J_df(OBS_CIRCLE_SEC, SEC_EQUATOR) +
+                pysecs.J_cf(OBS_CIRCLE_SEC, SEC_EQUATOR))[..., 0]
+    assert_allclose(J_pred, expected)